@@ -19,12 +19,15 @@ from flask_login import (
     logout_user,
     current_user,
 )
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
 from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash, check_password_hash
 from reportlab.pdfgen import canvas
 import soundfile as sf
 from init import create_app, db
 from utils import lsb_stego
+from utils.user_cache import UserIdentityCache, UserSnapshot
 from models import User, AudioTrack, WatermarkRecord
 
 basedir = os.path.abspath(os.path.dirname(__file__))
@@ -34,6 +37,8 @@ app_config = {
     "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(basedir, "database_lsb.db"),
     "UPLOAD_FOLDER": os.path.join("static", "uploads"),
     "CERT_FOLDER": os.path.join("static", "certificates"),
+    "USER_CACHE_SIZE": 1024,
+    "USER_CACHE_TTL": 300,
 }
 
 app = create_app(config_updates=app_config)
@@ -44,11 +49,83 @@ os.makedirs(app.config["CERT_FOLDER"], exist_ok=True)
 login_manager = LoginManager(app)
 login_manager.login_view = "login"
 
+user_cache = UserIdentityCache(
+    max_size=app.config["USER_CACHE_SIZE"], ttl=app.config["USER_CACHE_TTL"]
+)
+
+USER_IDENTITY_FIELDS = ("email", "role", "password_hash")
+
 
 @login_manager.user_loader
 def load_user(user_id):
-    """Завантажує користувача з БД за ID для Flask-Login."""
-    return User.query.get(int(user_id))
+    """
+    Завантажує користувача для Flask-Login.
+
+    Спочатку шукає знімок у кеші, і лише при промаху звертається до БД.
+
+    :param user_id: ID користувача із сесії.
+    :return: Знімок користувача або None, якщо користувача не існує.
+    :rtype: UserSnapshot | None
+    """
+    user_id = int(user_id)
+    snapshot = user_cache.get(user_id)
+    if snapshot is None:
+        token = user_cache.token()
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        snapshot = UserSnapshot.from_user(user)
+        user_cache.put(snapshot, token=token)
+    return snapshot
+
+
+def _mark_user_stale(target):
+    """Запам'ятовує ID користувача в сесії для скидання кешу після коміту."""
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("stale_user_ids", set()).add(target.id)
+
+
+@event.listens_for(User, "after_update")
+def invalidate_user_on_update(mapper, connection, target):
+    """Позначає знімок застарілим при зміні email, ролі чи пароля."""
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in USER_IDENTITY_FIELDS):
+        _mark_user_stale(target)
+
+
+@event.listens_for(User, "after_delete")
+def invalidate_user_on_delete(mapper, connection, target):
+    """Позначає знімок застарілим при видаленні користувача."""
+    _mark_user_stale(target)
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_stale_users(session):
+    """
+    Скидає кешовані знімки змінених користувачів після коміту.
+
+    Скидання відбувається лише після коміту зовнішньої транзакції, щоб
+    паралельний запит не повернув у кеш ще не закомічені (старі) дані.
+    Звільнення SAVEPOINT (вкладеної транзакції) ігнорується.
+    """
+    if session.in_nested_transaction():
+        return
+    for user_id in session.info.pop("stale_user_ids", ()):
+        user_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_stale_users(session):
+    """
+    Відкидає позначені зміни, якщо скасовано зовнішню транзакцію.
+
+    При відкаті SAVEPOINT позначки зберігаються: вони можуть належати
+    змінам зовнішньої транзакції, а зайве скидання кешу нешкідливе.
+    """
+    if session.in_nested_transaction():
+        return
+    session.info.pop("stale_user_ids", None)
 
 
 def generate_pdf(track, watermark_code, created_at_time):
@@ -103,8 +180,10 @@ def login():
     if request.method == "POST":
         email = request.form.get("email")
         password = request.form.get("password")
+        token = user_cache.token()
         user = User.query.filter_by(email=email).first()
         if user and check_password_hash(user.password_hash, password):
+            user_cache.put(UserSnapshot.from_user(user), token=token)
             login_user(user)
             return redirect(url_for("dashboard"))
         flash("Помилка входу")
@@ -116,7 +195,9 @@ def login():
 def dashboard():
     """Особистий кабінет користувача. Відображає список захищених треків."""
     return render_template(
-        "dashboard.html", name=current_user.email, tracks=current_user.tracks
+        "dashboard.html",
+        name=current_user.email,
+        tracks=AudioTrack.query.filter_by(owner_user_id=current_user.id).all(),
     )
 
 
@@ -202,7 +283,7 @@ def protect():
                 artist=artist,
                 isrc=isrc,
                 filename=protected_filename,
-                owner=current_user,
+                owner_user_id=current_user.id,
             )
             db.session.add(new_track)
             db.session.commit()
@@ -2,9 +2,13 @@ import unittest
 import os
 import wave
 import shutil
+import tempfile
+import threading
+from unittest import mock
 from init import create_app
-from app import db, User, AudioTrack, WatermarkRecord
+from app import db, User, AudioTrack, WatermarkRecord, load_user, user_cache
 import utils.lsb_stego as lsb_stego
+from utils.user_cache import UserIdentityCache, UserSnapshot
 
 
 class TestSteganography(unittest.TestCase):
@@ -154,5 +158,207 @@ class TestDatabaseModels(unittest.TestCase):
         self.assertEqual(track.watermark.watermark_payload, "WM-1")
 
 
+class TestUserIdentityCache(unittest.TestCase):
+    """
+    Тестування кешу ідентичності користувачів (user_cache.py)
+    """
+
+    def test_put_get(self):
+        """Збережений знімок повертається за ID"""
+        cache = UserIdentityCache(max_size=2, ttl=60)
+        cache.put(UserSnapshot(1, "a@test.com", "author"))
+        self.assertEqual(cache.get(1).email, "a@test.com")
+        self.assertIsNone(cache.get(2))
+
+    def test_lru_eviction(self):
+        """При переповненні витісняється найдавніше використаний запис"""
+        cache = UserIdentityCache(max_size=2, ttl=60)
+        cache.put(UserSnapshot(1, "a", "author"))
+        cache.put(UserSnapshot(2, "b", "author"))
+        cache.get(1)
+        cache.put(UserSnapshot(3, "c", "author"))
+        self.assertIsNotNone(cache.get(1))
+        self.assertIsNone(cache.get(2))
+        self.assertEqual(len(cache), 2)
+
+    def test_ttl_expiry(self):
+        """Застарілий запис не повертається"""
+        cache = UserIdentityCache(max_size=2, ttl=10)
+        with mock.patch("utils.user_cache.time.monotonic", return_value=100.0):
+            cache.put(UserSnapshot(1, "a", "author"))
+        with mock.patch("utils.user_cache.time.monotonic", return_value=111.0):
+            self.assertIsNone(cache.get(1))
+        self.assertEqual(len(cache), 0)
+
+
+class TestLoadUser(unittest.TestCase):
+    """
+    Тестування завантаження користувача для Flask-Login через кеш
+    """
+
+    def setUp(self):
+        self.app = create_app(
+            {
+                "TESTING": True,
+                "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+            }
+        )
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+        db.create_all()
+        user_cache.clear()
+
+        self.user = User(email="cache@test.com", password_hash="p")
+        db.session.add(self.user)
+        db.session.commit()
+
+    def tearDown(self):
+        user_cache.clear()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_cache_hit_skips_database(self):
+        """Повторне завантаження не звертається до БД"""
+        first = load_user(str(self.user.id))
+        with mock.patch.object(db.session, "get") as db_get:
+            second = load_user(str(self.user.id))
+        db_get.assert_not_called()
+        self.assertIs(first, second)
+        self.assertEqual(second.email, "cache@test.com")
+
+    def test_unknown_user(self):
+        """Неіснуючий користувач повертає None"""
+        self.assertIsNone(load_user("9999"))
+
+    def test_invalidate_on_role_change(self):
+        """Зміна ролі скидає кешований знімок"""
+        load_user(str(self.user.id))
+        self.user.role = "auditor"
+        db.session.commit()
+        self.assertEqual(load_user(str(self.user.id)).role, "auditor")
+
+    def test_invalidate_on_email_change(self):
+        """Зміна email скидає кешований знімок"""
+        load_user(str(self.user.id))
+        self.user.email = "new@test.com"
+        db.session.commit()
+        self.assertEqual(load_user(str(self.user.id)).email, "new@test.com")
+
+    def test_invalidate_on_password_change(self):
+        """Зміна пароля скидає кешований знімок"""
+        first = load_user(str(self.user.id))
+        self.user.password_hash = "new-hash"
+        db.session.commit()
+        self.assertIsNot(load_user(str(self.user.id)), first)
+
+    def test_rollback_keeps_cached_snapshot(self):
+        """Скасована зміна не скидає кешований знімок"""
+        first = load_user(str(self.user.id))
+        self.user.role = "auditor"
+        db.session.flush()
+        db.session.rollback()
+        self.assertIs(load_user(str(self.user.id)), first)
+
+    def test_invalidate_on_delete(self):
+        """Видалення користувача скидає кешований знімок"""
+        user_id = str(self.user.id)
+        load_user(user_id)
+        db.session.delete(self.user)
+        db.session.commit()
+        self.assertIsNone(load_user(user_id))
+
+
+class TestLoadUserConcurrency(unittest.TestCase):
+    """
+    Тестування скидання кешу при паралельних запитах (файлова БД)
+    """
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.app = create_app(
+            {
+                "TESTING": True,
+                "SQLALCHEMY_DATABASE_URI": "sqlite:///" + self.db_path,
+            }
+        )
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+        db.create_all()
+        user_cache.clear()
+
+        self.user = User(email="race@test.com", password_hash="p")
+        db.session.add(self.user)
+        db.session.commit()
+
+    def tearDown(self):
+        user_cache.clear()
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+        self.app_context.pop()
+        os.remove(self.db_path)
+
+    def _load_in_other_request(self, user_id):
+        result = {}
+
+        def worker():
+            with self.app.app_context():
+                result["user"] = load_user(user_id)
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+        return result["user"]
+
+    def test_load_between_flush_and_commit(self):
+        """Знімок, прочитаний до коміту, не лишається в кеші після коміту"""
+        user_id = str(self.user.id)
+        load_user(user_id)
+        self.user.role = "auditor"
+        db.session.flush()
+
+        stale = self._load_in_other_request(user_id)
+        self.assertEqual(stale.role, "author")
+
+        db.session.commit()
+        self.assertEqual(load_user(user_id).role, "auditor")
+
+    def test_savepoint_release_defers_invalidation(self):
+        """Звільнення SAVEPOINT не скидає кеш до коміту зовнішньої транзакції"""
+        user_id = str(self.user.id)
+        load_user(user_id)
+        self.user.role = "auditor"
+        db.session.flush()
+        nested = db.session.begin_nested()
+        self.user.email = "nested@test.com"
+        nested.commit()
+
+        stale = self._load_in_other_request(user_id)
+        self.assertEqual(stale.role, "author")
+
+        db.session.commit()
+        self.assertEqual(load_user(user_id).role, "auditor")
+
+    def test_savepoint_rollback_keeps_outer_changes(self):
+        """Відкат SAVEPOINT не відкидає позначки зовнішньої транзакції"""
+        user_id = str(self.user.id)
+        load_user(user_id)
+        self.user.role = "auditor"
+        db.session.flush()
+        nested = db.session.begin_nested()
+        self.user.email = "nested@test.com"
+        db.session.flush()
+        nested.rollback()
+        db.session.commit()
+
+        snapshot = load_user(user_id)
+        self.assertEqual(snapshot.role, "auditor")
+        self.assertEqual(snapshot.email, "race@test.com")
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask_login import UserMixin
+
+
+class UserSnapshot(UserMixin):
+    """
+    Від'єднаний знімок користувача для Flask-Login.
+
+    Містить лише ідентифікаційні дані (id, email, роль) і не прив'язаний
+    до сесії SQLAlchemy, тому доступ до його полів не звертається до БД.
+    Зв'язані об'єкти (наприклад, треки) потрібно завантажувати окремим запитом.
+    """
+
+    def __init__(self, id, email, role):
+        self.id = id
+        self.email = email
+        self.role = role
+
+    @classmethod
+    def from_user(cls, user):
+        """
+        Створює знімок з об'єкта моделі User.
+
+        :param user: Об'єкт моделі User.
+        :return: Новий знімок користувача.
+        :rtype: UserSnapshot
+        """
+        return cls(id=user.id, email=user.email, role=user.role)
+
+
+class UserIdentityCache:
+    """
+    Обмежений за розміром кеш знімків користувачів із часом життя (TTL).
+
+    Записи витісняються за принципом LRU при перевищенні `max_size`
+    та вважаються застарілими через `ttl` секунд після додавання.
+    Кеш потокобезпечний. Кожне скидання збільшує лічильник поколінь,
+    що дозволяє відкинути знімок, прочитаний з БД до скидання (див. `token`).
+    """
+
+    def __init__(self, max_size=1024, ttl=300):
+        """
+        :param max_size: Максимальна кількість записів у кеші.
+        :type max_size: int
+        :param ttl: Час життя запису в секундах.
+        :type ttl: float
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """
+        Повертає знімок користувача з кешу.
+
+        :param user_id: ID користувача.
+        :type user_id: int
+        :return: Знімок або None, якщо запису немає чи він застарів.
+        :rtype: UserSnapshot | None
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            snapshot, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return snapshot
+
+    def token(self):
+        """
+        Повертає поточне покоління кешу.
+
+        Отримується перед читанням з БД і передається у `put`, щоб знімок
+        не потрапив у кеш, якщо між читанням і записом відбулося скидання.
+
+        :rtype: int
+        """
+        with self._lock:
+            return self._generation
+
+    def put(self, snapshot, token=None):
+        """
+        Додає (або оновлює) знімок користувача у кеші.
+
+        :param snapshot: Знімок користувача.
+        :type snapshot: UserSnapshot
+        :param token: Покоління, отримане з `token` перед читанням з БД.
+            Якщо відтоді кеш скидався, знімок не зберігається.
+        :type token: int | None
+        """
+        with self._lock:
+            if token is not None and token != self._generation:
+                return
+            self._entries[snapshot.id] = (snapshot, time.monotonic() + self.ttl)
+            self._entries.move_to_end(snapshot.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        """Видаляє запис користувача з кешу (якщо він є)."""
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        """Очищує весь кеш."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)